@@ -1,9 +1,11 @@
 import asyncio
+import os
+import time
 import socketio
 import aiohttp
 import numpy as np
 import h5py
-from datetime import datetime, UTC
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
@@ -11,9 +13,14 @@ class LiveMEA:
     SERVER_URL = "https://livemeaservice2.alpvision.com"
     MAX_QUEUE_SIZE = 100
     DEFAULT_DURATION = 5
+    PLOT_POINTS = 4000
 
     def __init__(
-        self, save_path: str | Path, recording_duration: int = 5, mea_id: int = 1
+        self,
+        save_path: str | Path,
+        recording_duration: int = 5,
+        mea_id: int = 1,
+        compression: str | None = "lzf",
     ):
         """This class lets you obtain live data from the LiveMEA service and save it to an HDF5 file.
 
@@ -23,25 +30,39 @@ class LiveMEA:
             recording_duration (int, optional): Duration of recording in seconds. Defaults to 5.
             save_path (str, optional): Path to save the HDF5 file. Defaults to "live_data.h5".
             mea_id (int, optional): MEA ID to use. Defaults to 1, must be between 1 and 4.
+            compression (str | None, optional): HDF5 compression filter ("lzf", "gzip" or None). Defaults to "lzf".
 
         Attributes:
             save_path (Path): Path to save the HDF5 file.
             duration (float): Duration of recording in seconds.
             mea_id (int): MEA ID to use.
             sio (socketio.AsyncClient): SocketIO client.
-            queue (asyncio.Queue): Queue to store data.
+            ring (np.ndarray): Preallocated ring buffer of the received, not yet saved, samples.
             mea_id (int): MEA ID to use
+            compression (str | None): HDF5 compression filter used when saving.
         """
         self._save_path = None
         self._duration = None
         self._meaid = None
+        self._n_written = 0
+        # events are created per recording, each record() runs its own loop
+        self._done = None
+        self._new_sample = None
+        self._session = None
+        # absolute write/read positions in the ring buffer
+        self._widx = 0
+        self._ridx = 0
         ###
         self.sio = socketio.AsyncClient()
-        self.queue = asyncio.Queue(maxsize=self.MAX_QUEUE_SIZE)
+        self.ring = np.empty((self.MAX_QUEUE_SIZE, 32, 4096), dtype=np.float32)
+        self._ring_ts = np.empty(self.MAX_QUEUE_SIZE, dtype="datetime64[ns]")
+        # the sample the writer thread is saving, kept out of the ring
+        self._staging = np.empty((32, 4096), dtype=np.float32)
         self.duration = recording_duration
         path = Path(save_path)
         self.save_path = path
         self.mea_id = mea_id
+        self.compression = compression
 
     @property
     def save_path(self):
@@ -50,16 +71,21 @@ class LiveMEA:
     @save_path.setter
     def save_path(self, path):
         path = Path(path)
-        self._save_path = path if path.suffix == ".h5" else path.with_suffix(".h5")
+        final = path if path.suffix == ".h5" else path.with_suffix(".h5")
 
-        if self.save_path.exists():
+        try:
+            os.lstat(final)
+        except FileNotFoundError:
+            pass
+        else:
             raise FileExistsError(
-                f"{path} already exists and would be overwritten by new data. Please choose a different path."
+                f"{final} already exists and would be overwritten by new data. Please choose a different path."
             )
 
-        if not self.save_path.parent.exists():
+        if not final.parent.is_dir():
+            final.parent.mkdir(parents=True, exist_ok=True)
             print("Created parent directories")
-            self.save_path.parent.mkdir(parents=True, exist_ok=True)
+        self._save_path = final
 
     @property
     def duration(self):
@@ -94,21 +120,36 @@ class LiveMEA:
             print(f"HTTP data fetch for {endpoint} was cancelled")
             raise
 
+    def _get_session(self):
+        """Return the HTTP session, created on first use.
+
+        The session is bound to the running event loop, so it is shared by
+        all requests of one recording and closed when the recording ends.
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=8, ttl_dns_cache=300)
+            )
+        return self._session
+
     async def _fetch_all_http_data(self):
         try:
-            async with aiohttp.ClientSession() as session:
-                check_service = await self._fetch_http_data(session, "/check")
-                is_live = await self._fetch_http_data(session, "/islive")
-                default_mea = await self._fetch_http_data(session, "/defaultmea")
-
-                status = f"{check_service}"
-                if is_live:
-                    status += " - Live"
-                else:
-                    status += " - Offline"
-                    raise Exception("LiveMEA service is offline")
-                print(f"Status - {status}")
-                print(f"Default MEA: {int(default_mea[-2]) + 1}")
+            session = self._get_session()
+            # the probes are independent, issue them concurrently
+            check_service, is_live, default_mea = await asyncio.gather(
+                self._fetch_http_data(session, "/check"),
+                self._fetch_http_data(session, "/islive"),
+                self._fetch_http_data(session, "/defaultmea"),
+            )
+
+            status = f"{check_service}"
+            if is_live:
+                status += " - Live"
+            else:
+                status += " - Offline"
+                raise Exception("LiveMEA service is offline")
+            print(f"Status - {status}")
+            print(f"Default MEA: {int(default_mea[-2]) + 1}")
 
         except asyncio.CancelledError:
             print("fetch_all_http_data was cancelled")
@@ -117,74 +158,200 @@ class LiveMEA:
     async def _listen_socket_events(self):
         @self.sio.event
         async def livedata(data):
-            buffer = data["buffer"]
+            # socket.io binary attachments arrive as bytes already; only
+            # unwrap the {"buffer": ...} envelope when the server sends one
+            buffer = data if isinstance(data, (bytes, bytearray)) else data["buffer"]
+            # frombuffer + reshape are both views: no copy is made, and the
+            # array keeps the received bytes object alive for as long as needed
             data = np.frombuffer(buffer, dtype=np.float32)
+            if data.size != 32 * 4096:
+                raise ValueError(f"Expected 131072 values per sample, got {data.size}")
             # data is 4096 points x 32 electrodes
             elec_data = data.reshape(32, 4096)
-            if self.queue.full():
-                self.queue.get_nowait()
-            await self.queue.put((datetime.now(UTC), elec_data))
-            print(f"{self.queue.qsize()} / {int(self.duration)}", end="\r")
+            self._push_sample(np.datetime64(time.time_ns(), "ns"), elec_data)
+            self._new_sample.set()
 
         await self.sio.connect(self.SERVER_URL)
         await self.sio.emit("meaid", self.mea_id - 1)
         # once we choose the MEA,
         # we start listening to the livedata event
         # since the above event hook runs automatically;
-        # all we have to do is wait for the queue 
-        # to receive the specified amount of data
+        # all we have to do is wait for the writer
+        # to save the specified amount of data
         try:
-            while self.queue.qsize() < self.duration:
-                # res = await self.sio.wait()
-                await self.sio.sleep(0.5)
+            await self._done.wait()
         except asyncio.CancelledError:
             print("listen_socket_events was cancelled")
             await self.sio.disconnect()
             raise
 
-    async def _start_async_loop(self, duration):
-        tasks = [
-            self._fetch_all_http_data(),
-            self._listen_socket_events(),
-        ]
+    def _push_sample(self, timestamp, elec_data):
+        """Copy a received sample into the ring buffer, dropping the oldest unsaved one when full."""
+        if self._widx - self._ridx >= self.MAX_QUEUE_SIZE:
+            self._ridx += 1
+        slot = self._widx % self.MAX_QUEUE_SIZE
+        np.copyto(self.ring[slot], elec_data)
+        self._ring_ts[slot] = timestamp
+        self._widx += 1
+
+    def _pop_sample(self):
+        """Take the oldest unsaved sample out of the ring buffer.
+
+        The sample is copied to a staging buffer, so its slot can be reused by
+        the handler while the writer thread is still saving it.
+        """
+        slot = self._ridx % self.MAX_QUEUE_SIZE
+        self._ridx += 1
+        np.copyto(self._staging, self.ring[slot])
+        return self._ring_ts[slot], self._staging
+
+    def _create_datasets(self, f):
+        """Create the resizable datasets the samples are appended to while recording."""
+        filters = {}
+        if self.compression is not None:
+            # shuffle groups the float32 bytes before compression for a better ratio
+            filters = dict(
+                shuffle=True,
+                compression=self.compression,
+                compression_opts=4 if self.compression == "gzip" else None,
+            )
+        # whole recording as a single (n_samples, 32, 4096) dataset,
+        # one chunk per sample
+        dset = f.create_dataset(
+            "data",
+            shape=(0, 32, 4096),
+            maxshape=(None, 32, 4096),
+            dtype=np.float32,
+            chunks=(1, 32, 4096),
+            **filters,
+        )
+        ts_dset = f.create_dataset(
+            "timestamps", shape=(0,), maxshape=(None,), dtype="i8"
+        )
+        # HDF5 has no datetime type, timestamps are stored as their int64 value
+        ts_dset.attrs["units"] = "ns since epoch"
+        return dset, ts_dset
+
+    def _write_sample(self, dset, ts_dset, n, timestamp, elec_data):
+        # SWMR writers may only grow datasets: readers see the new sample
+        # once the datasets are extended and flushed. The timestamp goes
+        # first, so readers may briefly see one more timestamp than samples
+        ts_dset.resize(n + 1, axis=0)
+        ts_dset[n] = timestamp.astype("i8")
+        ts_dset.flush()
+        dset.resize(n + 1, axis=0)
+        if self.compression is None:
+            # each sample is exactly one unfiltered chunk: write its bytes
+            # directly and skip the filter pipeline altogether
+            dset.id.write_direct_chunk((n, 0, 0), elec_data)
+        else:
+            dset[n] = elec_data
+        dset.flush()
+
+    async def _writer_loop(self, dset, ts_dset, executor):
+        loop = asyncio.get_running_loop()
         try:
-            while self.queue.qsize() < duration:
-                await asyncio.gather(*tasks)
-        except asyncio.TimeoutError:
-            print("Async loop completed after timeout")
+            while self._n_written < self.duration:
+                while self._ridx == self._widx:
+                    self._new_sample.clear()
+                    await self._new_sample.wait()
+                timestamp, elec_data = self._pop_sample()
+                write = loop.run_in_executor(
+                    executor,
+                    self._write_sample,
+                    dset,
+                    ts_dset,
+                    self._n_written,
+                    timestamp,
+                    elec_data,
+                )
+                try:
+                    await asyncio.shield(write)
+                except asyncio.CancelledError:
+                    # the worker thread cannot be interrupted: let the write
+                    # finish before the file is closed under it
+                    await write
+                    raise
+                self._n_written += 1
+                print(f"{self._n_written} / {int(self.duration)}", end="\r")
+            self._done.set()
         except asyncio.CancelledError:
-            print("Recording finished")
+            print("writer_loop was cancelled")
             raise
-        finally:
-            await self.sio.disconnect()
 
-    def _save_data(self, data, file_path):
-        with h5py.File(file_path, "w") as f:
-            for timestamp, elec_data in data.items():
-                grp = f.create_group(str(timestamp))
-                for elec, data in elec_data.items():
-                    grp.create_dataset(elec, data=data)
-            print("Data saved to live_data.h5")
+    async def _start_async_loop(self):
+        # start tasks eagerly so they run without an extra loop iteration;
+        # the loop may be the caller's own, so its factory is restored after
+        loop = asyncio.get_running_loop()
+        previous_factory = loop.get_task_factory()
+        if hasattr(asyncio, "eager_task_factory"):
+            loop.set_task_factory(asyncio.eager_task_factory)
+        try:
+            # the service checks are one-shot: run them before connecting,
+            # so an offline service fails fast without creating the file
+            await self._fetch_all_http_data()
+            created = False
+            try:
+                # chunk cache large enough to hold whole (32, 4096) float32 chunks
+                # "x" fails if the file appeared since save_path was set,
+                # instead of truncating it
+                with h5py.File(
+                    self.save_path,
+                    "x",
+                    libver="latest",
+                    rdcc_nbytes=64 * 1024 * 1024,
+                    rdcc_nslots=1009,
+                    rdcc_w0=1.0,
+                ) as f, ThreadPoolExecutor(max_workers=1) as executor:
+                    created = True
+                    # single worker so HDF5 writes stay ordered but off the event loop;
+                    # it is shut down (and drained) before the file is closed
+                    dset, ts_dset = self._create_datasets(f)
+                    # from here on, readers can open the file while it is being written
+                    f.swmr_mode = True
+                    try:
+                        # each task runs exactly once; the group waits for both
+                        async with asyncio.TaskGroup() as tg:
+                            tg.create_task(self._listen_socket_events())
+                            tg.create_task(self._writer_loop(dset, ts_dset, executor))
+                    except ExceptionGroup as eg:
+                        # surface the original error, as asyncio.gather used to
+                        raise eg.exceptions[0] from eg
+                    except asyncio.CancelledError:
+                        print("Recording finished")
+                        raise
+                    finally:
+                        await self.sio.disconnect()
+            except BaseException:
+                # nothing was recorded: don't leave an empty file that would
+                # make a retry with the same save_path fail
+                if created and self._n_written == 0:
+                    self.save_path.unlink(missing_ok=True)
+                raise
+            print(f"Data saved to {self.save_path}")
+        finally:
+            loop.set_task_factory(previous_factory)
 
     async def record_async(self):
+        self._n_written = 0
+        self._widx = self._ridx = 0
+        self._done = asyncio.Event()
+        self._new_sample = asyncio.Event()
         try:
-            await self._start_async_loop(self.duration)
+            await self._start_async_loop()
         except asyncio.TimeoutError:
             raise
         except asyncio.CancelledError:
             print("Recording live data was cancelled")
             raise
+        finally:
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
 
-        data = {}
-        while not self.queue.empty():
-            timestamp, elec_data = await self.queue.get()
-            data[timestamp] = {
-                f"electrode_{i}": elec_data[i].tolist() for i in range(32)
-            }
-            self.queue.task_done()
-
-        self._save_data(data, self.save_path)
-        return data  # if you only need the data, disable the save_data method and use the return statement
+        # samples are streamed to save_path while recording, so the whole
+        # recording is never held in memory; use load_data to read it back
+        return self.save_path
 
     def record(self, duration: int = None, save_path: str | Path = None):
         """Record live data from the LiveMEA service and save it to an HDF5 file.
@@ -192,6 +359,9 @@ class LiveMEA:
         Args:
             duration (int, optional): Duration of recording in seconds. Defaults to None.
             save_path (str | Path, optional): Path to save the HDF5 file. Defaults to None.
+
+        Returns:
+            Path: Path of the HDF5 file the data was saved to.
         """
         if duration:
             self.duration = duration
@@ -214,40 +384,71 @@ class LiveMEA:
 
         Returns:
             LiveMEA: Instance of LiveMEA class.
-            dict: Data recorded.
+            Path: Path of the HDF5 file the data was saved to.
         """
         live_mea = cls(recording_duration=duration, save_path=save_path, mea_id=mea_id)
-        data = live_mea.record()
-        return live_mea, data
+        path = live_mea.record()
+        return live_mea, path
+
+    @staticmethod
+    def load_data(h5f_path: str | Path):
+        """Load a recording from an HDF5 file into memory.
+
+        The file may still be being recorded; only the samples that have both
+        their data and timestamp written are returned.
+
+        Args:
+            h5f_path (str | Path): Path of the HDF5 file.
+
+        Returns:
+            tuple: Timestamps (n_samples,) as datetime64[ns] and data (n_samples, 32, 4096).
+        """
+        with h5py.File(Path(h5f_path), "r", libver="latest", swmr=True) as f:
+            n = min(len(f["timestamps"]), len(f["data"]))
+            timestamps = f["timestamps"][:n].view("datetime64[ns]")
+            data = f["data"][:n]
+        return timestamps, data
+
+    @staticmethod
+    def _decimate(signal, n_points):
+        """Min/max decimate a 1D signal to about n_points, keeping its envelope.
+
+        Returns the sample indices and values to plot.
+        """
+        stride = max(1, signal.size // max(1, n_points // 2))
+        if stride == 1:
+            return np.arange(signal.size), signal
+        # the last bin holds the leftover samples, so the end is still drawn
+        starts = np.arange(0, signal.size, stride)
+        values = np.empty(2 * starts.size, dtype=signal.dtype)
+        values[0::2] = np.minimum.reduceat(signal, starts)
+        values[1::2] = np.maximum.reduceat(signal, starts)
+        return np.repeat(starts, 2), values
 
     @staticmethod
     def plot_data(h5f_path: str | Path):
-        """Plot data from an HDF5 file."""
+        """Plot data from an HDF5 file, which may still be being recorded."""
         try:
             import matplotlib.pyplot as plt
         except ImportError:
             raise ModuleNotFoundError("Matplotlib is required for plotting")
-        h5_file_path = Path(h5f_path)
-        with h5py.File(h5_file_path, "r") as f:
-            timestamps = sorted(f.keys(), key=lambda x: str(x))
-            num_channels = 32
-            fig, axes = plt.subplots(num_channels, 1, figsize=(15, 30), sharex=True)
+        # one bulk read of the (n_samples, 32, 4096) dataset
+        _, data = LiveMEA.load_data(h5f_path)
+        num_channels = 32
+        fig, axes = plt.subplots(num_channels, 1, figsize=(15, 30), sharex=True)
 
-            for i in range(num_channels):
-                all_data = []
-                for timestamp in timestamps:
-                    channel_data = f[timestamp][f"electrode_{i}"][:]
-                    all_data.extend(channel_data)
-                axes[i].plot(all_data)
-                axes[i].set_title(f"Electrode {i}")
+        for i in range(num_channels):
+            # a few thousand points is plenty for the figure width
+            axes[i].plot(*LiveMEA._decimate(data[:, i, :].ravel(), LiveMEA.PLOT_POINTS))
+            axes[i].set_title(f"Electrode {i}")
 
-            plt.xlabel("Time")
-            plt.tight_layout()
-            plt.show()
+        plt.xlabel("Time")
+        plt.tight_layout()
+        plt.show()
 
 
 # Example usage
 if __name__ == "__main__":
     live_mea = LiveMEA(recording_duration=10, save_path="live_data.h5")
-    data = live_mea.record()
-    LiveMEA.plot_data("live_data.h5")
+    path = live_mea.record()
+    LiveMEA.plot_data(path)
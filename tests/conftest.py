@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# livemea is used as a script directory, as in livemea/__main__.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "livemea"))
@@ -0,0 +1,35 @@
+import numpy as np
+
+from MEA_live import LiveMEA
+
+
+def test_empty_signal():
+    x, y = LiveMEA._decimate(np.array([], dtype=np.float32), 4000)
+    assert x.size == 0
+    assert y.size == 0
+
+
+def test_short_signal_is_not_decimated():
+    signal = np.arange(100, dtype=np.float32)
+    x, y = LiveMEA._decimate(signal, 4000)
+    np.testing.assert_array_equal(x, np.arange(100))
+    np.testing.assert_array_equal(y, signal)
+
+
+def test_envelope_is_kept():
+    signal = np.zeros(8000, dtype=np.float32)
+    signal[1234] = 5
+    signal[5678] = -3
+    x, y = LiveMEA._decimate(signal, 400)
+    assert y.size <= 400 + 2
+    assert y.max() == 5
+    assert y.min() == -3
+
+
+def test_leftover_samples_are_plotted():
+    # 20479 is not a multiple of the stride
+    signal = np.arange(20479, dtype=np.float32)
+    x, y = LiveMEA._decimate(signal, 4000)
+    assert y[-1] == 20478
+    assert x[-1] <= 20478
+    assert y.min() == 0
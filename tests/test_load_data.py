@@ -0,0 +1,17 @@
+import h5py
+import numpy as np
+
+from MEA_live import LiveMEA
+
+
+def test_lengths_are_clipped_to_complete_samples(tmp_path):
+    path = tmp_path / "recording.h5"
+    with h5py.File(path, "w", libver="latest") as f:
+        # as seen by a reader while a sample is being appended
+        f.create_dataset("data", data=np.ones((3, 32, 4096), dtype=np.float32))
+        f.create_dataset("timestamps", data=np.arange(2, dtype="i8"))
+
+    timestamps, data = LiveMEA.load_data(path)
+
+    assert timestamps.shape == (2,)
+    assert data.shape == (2, 32, 4096)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from MEA_live import LiveMEA
+
+
+class FakeSocket:
+    """Stands in for socketio.AsyncClient, sending samples once the MEA is chosen."""
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.handlers = {}
+
+    def event(self, handler):
+        self.handlers[handler.__name__] = handler
+        return handler
+
+    async def connect(self, url):
+        pass
+
+    async def emit(self, event, data):
+        for sample in self.samples:
+            await self.handlers["livedata"]({"buffer": sample.tobytes()})
+
+    async def disconnect(self):
+        pass
+
+
+async def fake_fetch_http_data(session, endpoint):
+    return {"/check": "OK", "/islive": True, "/defaultmea": "[0]"}[endpoint]
+
+
+def make_mea(path, samples, **kwargs):
+    mea = LiveMEA(save_path=path, recording_duration=len(samples), **kwargs)
+    mea.sio = FakeSocket(samples)
+    mea._fetch_http_data = fake_fetch_http_data
+    return mea
+
+
+def random_samples(n):
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((n, 32, 4096)).astype(np.float32)
+
+
+@pytest.mark.parametrize("compression", [None, "lzf", "gzip"])
+def test_recording_round_trips(tmp_path, compression):
+    samples = random_samples(3)
+    mea = make_mea(tmp_path / "recording", samples, compression=compression)
+
+    path = mea.record()
+
+    assert path == tmp_path / "recording.h5"
+    timestamps, data = LiveMEA.load_data(path)
+    np.testing.assert_array_equal(data, samples)
+    assert timestamps.dtype == np.dtype("datetime64[ns]")
+    assert timestamps.shape == (3,)
+    assert (np.diff(timestamps) >= np.timedelta64(0, "ns")).all()
+
+
+class RefusingSocket(FakeSocket):
+    async def connect(self, url):
+        raise ConnectionError("socket refused")
+
+
+def test_recording_error_is_reported_unwrapped(tmp_path, capsys):
+    mea = make_mea(tmp_path / "recording", random_samples(1))
+    mea.sio = RefusingSocket([])
+
+    assert mea.record() is None
+    assert "socket refused" in capsys.readouterr().out
+
+
+def test_progress_reaches_duration(tmp_path, capsys):
+    mea = make_mea(tmp_path / "recording", random_samples(5))
+
+    mea.record()
+
+    assert "5 / 5" in capsys.readouterr().out
+
+
+def test_failed_recording_leaves_no_file_and_can_be_retried(tmp_path):
+    samples = random_samples(2)
+    mea = make_mea(tmp_path / "recording", samples)
+    mea.sio = RefusingSocket([])
+
+    assert mea.record() is None
+    assert not mea.save_path.exists()
+
+    mea.sio = FakeSocket(samples)
+    path = mea.record()
+
+    _, data = LiveMEA.load_data(path)
+    np.testing.assert_array_equal(data, samples)
+
+
+def test_existing_file_is_not_overwritten(tmp_path):
+    samples = random_samples(1)
+    mea = make_mea(tmp_path / "recording", samples)
+    mea.record()
+    size = mea.save_path.stat().st_size
+
+    assert mea.record() is None
+    assert mea.save_path.stat().st_size == size
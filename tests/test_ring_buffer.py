@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from MEA_live import LiveMEA
+
+
+class SmallRingMEA(LiveMEA):
+    MAX_QUEUE_SIZE = 4
+
+
+@pytest.fixture
+def mea(tmp_path):
+    return SmallRingMEA(save_path=tmp_path / "recording.h5")
+
+
+def push(mea, value):
+    sample = np.full((32, 4096), value, dtype=np.float32)
+    mea._push_sample(np.datetime64(value, "ns"), sample)
+
+
+def pop_all(mea):
+    values = []
+    while mea._ridx < mea._widx:
+        timestamp, data = mea._pop_sample()
+        assert (data == timestamp.astype("i8")).all()
+        values.append(int(timestamp.astype("i8")))
+    return values
+
+
+def test_samples_keep_order_across_wrap_around(mea):
+    for value in range(3):
+        push(mea, value)
+    assert pop_all(mea) == [0, 1, 2]
+    # the next samples wrap around the end of the 4-slot ring
+    for value in range(3, 9):
+        push(mea, value)
+        assert pop_all(mea) == [value]
+
+
+def test_overflow_drops_oldest_samples(mea):
+    for value in range(6):
+        push(mea, value)
+    assert pop_all(mea) == [2, 3, 4, 5]
+
+
+def test_popped_sample_is_not_overwritten_by_wrap_around(mea):
+    for value in range(4):
+        push(mea, value)
+    timestamp, data = mea._pop_sample()
+    # the handler keeps receiving, and overflowing, while sample 0 is saved
+    for value in range(4, 12):
+        push(mea, value)
+    assert timestamp == np.datetime64(0, "ns")
+    assert (data == 0).all()
+    assert pop_all(mea) == [8, 9, 10, 11]
@@ -0,0 +1,34 @@
+import pytest
+
+from MEA_live import LiveMEA
+
+
+@pytest.mark.parametrize("name", ["recording", "recording.h5", "recording.txt"])
+def test_suffix_is_h5(tmp_path, name):
+    mea = LiveMEA(save_path=tmp_path / name)
+    assert mea.save_path == tmp_path / "recording.h5"
+
+
+def test_existing_suffixed_path_is_rejected(tmp_path):
+    (tmp_path / "recording.h5").touch()
+    with pytest.raises(FileExistsError, match="recording.h5"):
+        LiveMEA(save_path=tmp_path / "recording")
+
+
+def test_rejected_path_keeps_previous_value(tmp_path):
+    mea = LiveMEA(save_path=tmp_path / "first")
+    (tmp_path / "second.h5").touch()
+    with pytest.raises(FileExistsError):
+        mea.save_path = tmp_path / "second"
+    assert mea.save_path == tmp_path / "first.h5"
+
+
+def test_parent_directories_are_created(tmp_path):
+    mea = LiveMEA(save_path=tmp_path / "a" / "b" / "recording")
+    assert mea.save_path.parent.is_dir()
+
+
+def test_parent_that_is_a_file_is_rejected(tmp_path):
+    (tmp_path / "parent").touch()
+    with pytest.raises(FileExistsError):
+        LiveMEA(save_path=tmp_path / "parent" / "recording")